@@ -1,9 +1,125 @@
 import subprocess
 import logging
+from typing import Optional
 
-def capture_image(path: str) -> bool:
+# In-process V4L2 capture is used when its optional dependencies are installed.
+try:
+    import numpy as np
+    from PIL import Image
+    from linuxpy.video.device import Device, VideoCapture
+except ImportError:
+    Device = None
+
+VIDEO_DEVICE = '/dev/video0'
+FRAME_WIDTH = 1280
+FRAME_HEIGHT = 960
+
+# ffmpeg arguments for a single YUYV frame from the V4L2 device; the output path is appended per call.
+_FFMPEG_CMD = (
+    'ffmpeg',
+    '-hide_banner',
+    '-loglevel', 'error',
+    '-nostdin',
+    '-f', 'v4l2',
+    '-input_format', 'yuyv422',
+    '-video_size', f'{FRAME_WIDTH}x{FRAME_HEIGHT}',
+    '-thread_queue_size', '1',
+    '-i', VIDEO_DEVICE,
+    '-frames:v', '1',
+    '-q:v', '2',
+    '-y',
+)
+
+# Camera kept open between captures so the format is negotiated only once.
+_CAM: Optional["Device"] = None
+
+
+def _open_camera() -> "Device":
+    """Opens the V4L2 device and sets the YUYV capture format on first use."""
+    global _CAM
+    if _CAM is None:
+        cam = Device(VIDEO_DEVICE)
+        cam.open()
+        try:
+            VideoCapture(cam).set_format(FRAME_WIDTH, FRAME_HEIGHT, 'YUYV')
+        except Exception:
+            cam.close()
+            raise
+        _CAM = cam
+    return _CAM
+
+
+def _close_camera() -> None:
+    """Closes the cached V4L2 device so the next capture reopens it."""
+    global _CAM
+    if _CAM is not None:
+        try:
+            _CAM.close()
+        except Exception:
+            pass
+        _CAM = None
+
+
+def _yuyv_to_rgb(data: bytes, width: int, height: int) -> "np.ndarray":
+    """
+    Converts a packed YUYV 4:2:2 frame to an RGB array using BT.601 (limited range).
+
+    The packed [Y0 U Y1 V] layout is split into separate Y, U and V planes with
+    strided views, and the chroma terms are computed at half horizontal
+    resolution before being widened to every pixel pair.
+
+    Args:
+        data (bytes): The raw frame as delivered by the camera.
+        width (int): Frame width in pixels.
+        height (int): Frame height in pixels.
+
+    Returns:
+        np.ndarray: A (height, width, 3) uint8 RGB array.
+    """
+    yuyv = np.frombuffer(data, dtype=np.uint8, count=width * height * 2).reshape(height, width, 2)
+    y = yuyv[:, :, 0].astype(np.float32)
+    u = yuyv[:, 0::2, 1].astype(np.float32)
+    v = yuyv[:, 1::2, 1].astype(np.float32)
+
+    y -= 16.0
+    y *= 1.164
+    u -= 128.0
+    v -= 128.0
+    r_off = np.repeat(1.596 * v, 2, axis=1)
+    g_off = np.repeat(-0.392 * u - 0.813 * v, 2, axis=1)
+    b_off = np.repeat(2.017 * u, 2, axis=1)
+
+    rgb = np.empty((height, width, 3), dtype=np.float32)
+    np.add(y, r_off, out=rgb[:, :, 0])
+    np.add(y, g_off, out=rgb[:, :, 1])
+    np.add(y, b_off, out=rgb[:, :, 2])
+    np.rint(rgb, out=rgb)
+    np.clip(rgb, 0.0, 255.0, out=rgb)
+    return rgb.astype(np.uint8)
+
+
+def _capture_v4l2(path: str) -> None:
     """
-    Captures an image from a V4L2 device using ffmpeg.
+    Grabs one YUYV frame directly from the V4L2 device and saves it as JPEG.
+
+    Streaming is started with a single buffer for each capture, so the frame
+    is always fresh and never sits in a driver queue between captures.
+
+    Args:
+        path (str): The file path where the image will be saved.
+    """
+    cam = _open_camera()
+    with VideoCapture(cam, size=1) as capture:
+        frame = next(iter(capture))
+        data = bytes(frame.data)
+        width, height = frame.width, frame.height
+
+    Image.fromarray(_yuyv_to_rgb(data, width, height), 'RGB').save(path, 'JPEG', quality=90)
+
+
+def _capture_ffmpeg(path: str) -> bool:
+    """
+    Captures an image from the V4L2 device by running ffmpeg.
 
     Args:
         path (str): The file path where the image will be saved.
@@ -11,20 +127,10 @@ def capture_image(path: str) -> bool:
     Returns:
         bool: True if the image was captured successfully, False otherwise.
     """
-    command = [
-        'ffmpeg',
-        '-f', 'v4l2',
-        '-input_format', 'yuyv422',
-        '-video_size', '1280x960',
-        '-i', '/dev/video0',
-        '-frames:v', '1',
-        '-q:v', '2',
-        '-y', path
-    ]
     try:
-        result = subprocess.run(
-            command,
-            stdout=subprocess.PIPE,
+        subprocess.run(
+            _FFMPEG_CMD + (path,),
+            stdout=subprocess.DEVNULL,
             stderr=subprocess.PIPE,
             check=True
         )
@@ -37,3 +143,27 @@ def capture_image(path: str) -> bool:
         logging.error(f"ffmpeg failed with exit code {e.returncode}")
         logging.error(f"ffmpeg stderr: {e.stderr.decode().strip()}")
         return False
+
+
+def capture_image(path: str) -> bool:
+    """
+    Captures an image from a V4L2 device.
+
+    Reads the frame in-process when linuxpy, numpy and Pillow are available,
+    otherwise (or if that fails) falls back to ffmpeg.
+
+    Args:
+        path (str): The file path where the image will be saved.
+
+    Returns:
+        bool: True if the image was captured successfully, False otherwise.
+    """
+    if Device is not None:
+        try:
+            _capture_v4l2(path)
+            logging.info(f"Image captured successfully and saved to {path}")
+            return True
+        except Exception as e:
+            logging.error(f"V4L2 capture failed, falling back to ffmpeg: {e}")
+            _close_camera()
+    return _capture_ffmpeg(path)
@@ -1,5 +1,6 @@
 import os
 import glob
+import subprocess
 import Adafruit_DHT
 import RPi.GPIO as GPIO
 
@@ -28,9 +29,14 @@ DHT_SENSOR = Adafruit_DHT.DHT22
 DHT_PIN = 27
 
 # --- DS18B20 Setup ---
-os.system('modprobe w1-gpio')
-os.system('modprobe w1-therm')
 base_dir = '/sys/bus/w1/devices/'
+if not os.path.isdir(base_dir):
+    # 1-Wire modules stay loaded once probed, so only load them when missing.
+    try:
+        subprocess.run(['modprobe', 'w1-gpio'], check=False)
+        subprocess.run(['modprobe', 'w1-therm'], check=False)
+    except OSError:
+        print("Warning: Could not run modprobe for 1-Wire modules.")
 try:
     device_folder = glob.glob(base_dir + '28-*')[0]
     device_file = device_folder + '/w1_slave'
@@ -45,3 +51,7 @@ CALIB_FILE = os.path.join(BASE_DIR, "soil_calibration.json")
 DB_FILE = os.path.join(BASE_DIR, "sensors.db")
 LOGS_DIR = os.path.join(BASE_DIR, "logs")
 STATUS_FILE = os.path.join(BASE_DIR, "logger_status.txt")
+
+
+# --- Web server ---
+WEB_THREADS = 8  # waitress worker threads; the database reader pool is sized to match
@@ -1,19 +1,124 @@
+import atexit
+import os
+import pathlib
+import queue
+import re
 import sqlite3
-import datetime
-from typing import List, Optional
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterable, Iterator, List, Optional, Sequence, Tuple
 
-from config import DB_FILE
+from config import DB_FILE, WEB_THREADS
+
+# Bumped whenever init_db() gains a new one-time migration step.
+SCHEMA_VERSION = 2
+
+_INSERT_LOG = """
+    INSERT INTO logs (timestamp, dht22_air_temp, dht22_humidity,
+                      ds18b20_soil_temp, soil_raw, soil_voltage,
+                      soil_percent, lux, stable, ts_unix)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_INSERT_RELAY_EVENT = "INSERT INTO relay_log (timestamp, relay_name, action, source, ts_unix) VALUES (?, ?, ?, ?, ?)"
+
+# ID selections such as "1,3,5-10": validated as a whole, then split into parts.
+_ID_PART_RE = re.compile(r"(\d+)(?:\s*-\s*(\d+))?")
+_ID_LIST_RE = re.compile(r"\s*\d+(?:\s*-\s*\d+)?(?:\s*,\s*\d+(?:\s*-\s*\d+)?)*\s*")
+
+# Read-only connections shared by the web server threads, created lazily up to
+# READER_POOL_SIZE, plus one writer connection serialized by _writer_lock.
+# One reader per server thread, so a request only waits when threads are added
+# beyond WEB_THREADS (e.g. the Flask development server).
+READER_POOL_SIZE = max(WEB_THREADS, os.cpu_count() or 1)
+READER_WAIT_TIMEOUT = 0.5  # seconds between checks for a free or creatable reader
+_readers: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+_readers_created = 0
+_readers_lock = threading.Lock()
+_writer_conn: Optional[sqlite3.Connection] = None
+_writer_lock = threading.Lock()
+
+# Relay events queued by the web server and written in batches by one thread.
+RELAY_BATCH_DELAY = 0.05  # seconds
+RELAY_RETRY_DELAY = 2.0  # seconds before a failed batch is written again
+RELAY_EXIT_FLUSH_TIMEOUT = 10.0  # seconds
+_relay_queue: "queue.Queue[Tuple[str, str, str, str, int]]" = queue.Queue()
+_relay_thread: Optional[threading.Thread] = None
+_relay_thread_lock = threading.Lock()
+
+
+def _connect(read_only: bool = False) -> sqlite3.Connection:
+    """
+    Opens a connection to the database with the shared PRAGMA settings.
+
+    WAL journaling with synchronous=NORMAL needs a single cheap append per commit
+    instead of the rollback journal's double fsync, and lets the web dashboard
+    read while the logger writes. Reads go through a memory map instead of
+    read() calls into the page cache.
+
+    Args:
+        read_only (bool): If True, opens the database with mode=ro. The journal mode
+            is persistent, so it is only set on read/write connections.
+
+    Returns:
+        sqlite3.Connection: The database connection object.
+    """
+    # Autocommit mode: sqlite3 issues no implicit BEGINs, writes that must be
+    # atomic go through transaction(). Pooled connections change threads, which
+    # is safe because each one is only ever used by one thread at a time.
+    if read_only:
+        conn = sqlite3.connect(pathlib.Path(DB_FILE).as_uri() + "?mode=ro", uri=True, isolation_level=None,
+                               check_same_thread=False, cached_statements=256)
+    else:
+        conn = sqlite3.connect(DB_FILE, isolation_level=None,
+                               check_same_thread=False, cached_statements=256)
+    c = conn.cursor()
+    if not read_only:
+        c.execute("PRAGMA journal_mode=WAL")
+    c.execute("PRAGMA synchronous=NORMAL")
+    c.execute("PRAGMA busy_timeout=5000")
+    c.execute("PRAGMA temp_store=MEMORY")
+    c.execute("PRAGMA cache_size=-4000")
+    c.execute("PRAGMA mmap_size=134217728")
+    return conn
+
+
+@contextmanager
+def transaction(conn: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    """
+    Runs the enclosed statements in one explicit write transaction.
+
+    Args:
+        conn (sqlite3.Connection): The database connection to use.
+
+    Yields:
+        sqlite3.Connection: The same connection, inside BEGIN IMMEDIATE.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+        conn.execute("COMMIT")
+    except BaseException:
+        # A failed COMMIT leaves the transaction open; roll it back so the
+        # connection stays usable, without hiding the original error.
+        if conn.in_transaction:
+            try:
+                conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+        raise
 
 
 def init_db() -> sqlite3.Connection:
     """
-    Initializes the database and the 'logs' table if it doesn't exist.
-    Also adds 'lux' and 'stable' columns if they are missing.
+    Initializes the database and the 'logs' and 'relay_log' tables if they don't exist.
+    Also adds 'lux', 'stable' and 'ts_unix' columns if they are missing.
 
     Returns:
         sqlite3.Connection: The database connection object.
     """
-    conn = sqlite3.connect(DB_FILE)
+    conn = _connect()
     c = conn.cursor()
 
     # Create the 'logs' table if it doesn't exist
@@ -28,25 +133,187 @@ def init_db() -> sqlite3.Connection:
             soil_voltage REAL,
             soil_percent REAL,
             lux REAL,
-            stable INTEGER DEFAULT 1
+            stable INTEGER DEFAULT 1,
+            ts_unix INTEGER
         )
     """)
-    conn.commit()
-
-    # Check for and add missing columns for backward compatibility
-    c.execute("PRAGMA table_info(logs)")
-    cols = [row[1] for row in c.fetchall()]
-    if "lux" not in cols:
-        print("[DB] Dodajem stupac 'lux' u tablicu logs...")
-        c.execute("ALTER TABLE logs ADD COLUMN lux REAL")
-        conn.commit()
-    if "stable" not in cols:
-        print("[DB] Dodajem stupac 'stable' u tablicu logs...")
-        c.execute("ALTER TABLE logs ADD COLUMN stable INTEGER DEFAULT 1;")
-        conn.commit()
+    c.execute("CREATE INDEX IF NOT EXISTS idx_logs_ts ON logs(timestamp)")
+    ensure_relay_log_table(conn)
+
+    # Check for and add missing columns for backward compatibility.
+    # Runs once per database; user_version records that the migration is done.
+    c.execute("PRAGMA user_version")
+    if c.fetchone()[0] < SCHEMA_VERSION:
+        with transaction(conn):
+            c.execute("PRAGMA table_info(logs)")
+            cols = [row[1] for row in c.fetchall()]
+            if "lux" not in cols:
+                print("[DB] Dodajem stupac 'lux' u tablicu logs...")
+                c.execute("ALTER TABLE logs ADD COLUMN lux REAL")
+            if "stable" not in cols:
+                print("[DB] Dodajem stupac 'stable' u tablicu logs...")
+                c.execute("ALTER TABLE logs ADD COLUMN stable INTEGER DEFAULT 1;")
+            if "ts_unix" not in cols:
+                print("[DB] Dodajem stupac 'ts_unix' u tablicu logs...")
+                c.execute("ALTER TABLE logs ADD COLUMN ts_unix INTEGER")
+                # logs.timestamp is local time formatted as YYYY-MM-DD_HH-MM-SS
+                c.execute("""
+                    UPDATE logs SET ts_unix = CAST(strftime('%s',
+                        substr(timestamp, 1, 10) || ' ' || replace(substr(timestamp, 12), '-', ':'),
+                        'utc') AS INTEGER)
+                    WHERE ts_unix IS NULL
+                """)
+
+            c.execute("PRAGMA table_info(relay_log)")
+            cols = [row[1] for row in c.fetchall()]
+            if "ts_unix" not in cols:
+                print("[DB] Dodajem stupac 'ts_unix' u tablicu relay_log...")
+                c.execute("ALTER TABLE relay_log ADD COLUMN ts_unix INTEGER")
+                # relay_log.timestamp is local time formatted as YYYY-MM-DD HH:MM:SS
+                c.execute("""
+                    UPDATE relay_log SET ts_unix = CAST(strftime('%s', timestamp, 'utc') AS INTEGER)
+                    WHERE ts_unix IS NULL
+                """)
+            c.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+    c.execute("CREATE INDEX IF NOT EXISTS idx_logs_ts_unix ON logs(ts_unix)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_relay_log_ts_unix ON relay_log(ts_unix)")
+    # Gather planner statistics once; afterwards optimize_db() keeps them current.
+    # (relay_log ORDER BY timestamp DESC LIMIT walks idx_relay_log_ts backwards;
+    # logs ORDER BY id DESC already walks the rowid B-tree and needs no index.)
+    c.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+    if c.fetchone() is None:
+        c.execute("ANALYZE")
     return conn
 
 
+def optimize_db(conn: sqlite3.Connection) -> None:
+    """
+    Lets SQLite refresh its query planner statistics where they are out of date.
+
+    Cheap when nothing changed, so long-lived connections can call it periodically.
+
+    Args:
+        conn (sqlite3.Connection): The database connection to use.
+    """
+    try:
+        conn.execute("PRAGMA optimize")
+    except sqlite3.Error as e:
+        print(f"[WARN] PRAGMA optimize nije uspio: {e}")
+
+
+def close_db(conn: sqlite3.Connection) -> None:
+    """
+    Closes a connection, first running optimize_db() on it.
+
+    Args:
+        conn (sqlite3.Connection): The database connection to close.
+    """
+    optimize_db(conn)
+    conn.close()
+
+
+@contextmanager
+def reader() -> Iterator[sqlite3.Connection]:
+    """
+    Checks out a read-only connection from the pool for the duration of the block.
+
+    Yields:
+        sqlite3.Connection: A read-only database connection.
+    """
+    global _readers_created
+    conn: Optional[sqlite3.Connection] = None
+    while conn is None:
+        try:
+            conn = _readers.get_nowait()
+            break
+        except queue.Empty:
+            pass
+        with _readers_lock:
+            create = _readers_created < READER_POOL_SIZE
+            if create:
+                _readers_created += 1
+        if create:
+            try:
+                if _writer_conn is None:
+                    with writer():
+                        pass  # first use: creates/migrates the schema via init_db()
+                conn = _connect(read_only=True)
+            except BaseException:
+                with _readers_lock:
+                    _readers_created -= 1
+                raise
+        else:
+            # Wait with a timeout: if a thread that was creating a reader fails,
+            # its slot is freed and a waiter gets to create one instead.
+            try:
+                conn = _readers.get(timeout=READER_WAIT_TIMEOUT)
+            except queue.Empty:
+                pass
+    try:
+        yield conn
+    finally:
+        _readers.put(conn)
+
+
+@contextmanager
+def writer() -> Iterator[sqlite3.Connection]:
+    """
+    Holds the single writer connection, inside a write transaction, for the duration of the block.
+
+    Yields:
+        sqlite3.Connection: The writer database connection.
+    """
+    global _writer_conn
+    with _writer_lock:
+        if _writer_conn is None:
+            _writer_conn = init_db()
+        with transaction(_writer_conn):
+            yield _writer_conn
+
+
+def insert_log_batch(conn: sqlite3.Connection, rows: Iterable[Sequence[Any]], commit: bool = True) -> None:
+    """
+    Inserts several sensor readings into the 'logs' table in a single transaction.
+
+    Args:
+        conn (sqlite3.Connection): The database connection to use.
+        rows (Iterable[Sequence[Any]]): Rows in the column order (timestamp, dht22_air_temp,
+            dht22_humidity, ds18b20_soil_temp, soil_raw, soil_voltage, soil_percent, lux, stable,
+            ts_unix).
+        commit (bool): If False, runs inside the caller's transaction (see transaction())
+            so further writes can be batched with it.
+    """
+    if commit:
+        with transaction(conn):
+            conn.executemany(_INSERT_LOG, rows)
+    else:
+        conn.executemany(_INSERT_LOG, rows)
+
+
+def parse_id_ranges(ids: str) -> List[Tuple[int, int]]:
+    """
+    Parses an ID selection into inclusive (start, end) ranges.
+
+    Args:
+        ids (str): A comma-separated string of IDs or ID ranges (e.g., "1,3,5-10").
+
+    Returns:
+        List[Tuple[int, int]]: One (start, end) pair per part; single IDs become (x, x).
+
+    Raises:
+        ValueError: If a part is not a number or a number range.
+    """
+    if not _ID_LIST_RE.fullmatch(ids):
+        raise ValueError(f"invalid ID list: {ids!r}")
+    ranges: List[Tuple[int, int]] = []
+    for a, b in _ID_PART_RE.findall(ids):
+        start = int(a)
+        end = int(b) if b else start
+        ranges.append((min(start, end), max(start, end)))
+    return ranges
+
+
 def delete_sql_data(ids: Optional[str] = None, delete_all: bool = False) -> None:
     """
     Deletes log records from the database.
@@ -55,58 +322,53 @@ def delete_sql_data(ids: Optional[str] = None, delete_all: bool = False) -> None
         ids (Optional[str]): A comma-separated string of IDs or ID ranges (e.g., "1,3,5-10").
         delete_all (bool): If True, deletes all records. This requires a confirmation prompt.
     """
-    conn = sqlite3.connect(DB_FILE)
+    conn = _connect()
     c = conn.cursor()
 
     if delete_all:
         confirm = input("⚠️  Sigurno želiš obrisati SVE podatke iz baze? (yes/no): ")
         if confirm.lower() == "yes":
-            c.execute("DELETE FROM logs")
-            c.execute("DELETE FROM sqlite_sequence WHERE name='logs'")  # reset autoincrement
-            conn.commit()
+            with transaction(conn):
+                c.execute("DELETE FROM logs")
+                c.execute("DELETE FROM sqlite_sequence WHERE name='logs'")  # reset autoincrement
             print("✅ Svi zapisi obrisani i indeks resetiran.")
         else:
             print("❌ Otkazano brisanje svih zapisa.")
     elif ids:
         try:
-            id_list: List[int] = []
-            for part in ids.split(","):
-                part = part.strip()
-                if "-" in part:
-                    start, end = map(int, part.split("-"))
-                    id_list.extend(range(start, end + 1))
-                else:
-                    id_list.append(int(part))
-
-            id_list = sorted(list(set(id_list)))
-            placeholders = ",".join("?" for _ in id_list)
-            c.execute(f"DELETE FROM logs WHERE id IN ({placeholders})", id_list)
-            conn.commit()
-            print(f"✅ Obrisani zapisi s ID-evima: {id_list}")
+            ranges = parse_id_ranges(ids)
+            with transaction(conn):
+                conn.executemany("DELETE FROM logs WHERE id BETWEEN ? AND ?", ranges)
+            shown = ", ".join(str(s) if s == e else f"{s}-{e}" for s, e in ranges)
+            print(f"✅ Obrisani zapisi s ID-evima: {shown}")
         except ValueError:
             print("❌ Greška: ID-evi moraju biti brojevi, npr. 1,3,5 ili 3-10.")
     else:
         print("⚠️ Nisi naveo ni --all ni --ids za brisanje.")
 
-    conn.close()
+    close_db(conn)
 
 
 def get_sql_data() -> None:
     """
     Retrieves and prints all logs from the database.
     """
-    conn = sqlite3.connect(DB_FILE)
+    conn = _connect()
     c = conn.cursor()
     c.execute("SELECT * FROM logs")
     rows = c.fetchall()
     for row in rows:
         print(row)
-    conn.close()
+    close_db(conn)
 
 # ------------------ RELAY LOG ------------------
-def ensure_relay_log_table() -> None:
-    """Ensures the 'relay_log' table exists in the database."""
-    conn = sqlite3.connect(DB_FILE)
+def ensure_relay_log_table(conn: sqlite3.Connection) -> None:
+    """
+    Ensures the 'relay_log' table exists in the database.
+
+    Args:
+        conn (sqlite3.Connection): The database connection to use.
+    """
     cur = conn.cursor()
     cur.execute("""
         CREATE TABLE IF NOT EXISTS relay_log (
@@ -114,29 +376,76 @@ def ensure_relay_log_table() -> None:
             timestamp TEXT NOT NULL,
             relay_name TEXT,
             action TEXT,
-            source TEXT
+            source TEXT,
+            ts_unix INTEGER
         )
     """)
-    conn.commit()
-    conn.close()
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_relay_log_ts ON relay_log(timestamp)")
+
+
+def _relay_event_row(relay_name: str, action: str, source: str) -> Tuple[str, str, str, str, int]:
+    """Builds a 'relay_log' row stamped with the current time."""
+    now = time.time()
+    ts = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now))
+    return ts, relay_name, action, source, int(now)
+
+
+def _relay_writer_loop() -> None:
+    """
+    Drains the relay event queue, writing everything queued within RELAY_BATCH_DELAY in one transaction.
+
+    A batch that fails to write is kept and retried (together with any newer
+    events) after RELAY_RETRY_DELAY, so acknowledged toggles are not lost.
+    """
+    items: List[Tuple[str, str, str, str, int]] = []
+    while True:
+        if not items:
+            items.append(_relay_queue.get())
+            time.sleep(RELAY_BATCH_DELAY)
+        while True:
+            try:
+                items.append(_relay_queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            with writer() as conn:
+                conn.executemany(_INSERT_RELAY_EVENT, items)
+        except Exception as e:
+            print(f"[WARN] Relay log upis nije uspio, ponovni pokušaj za {RELAY_RETRY_DELAY}s: {e}")
+            time.sleep(RELAY_RETRY_DELAY)
+            continue
+        for _ in items:
+            _relay_queue.task_done()
+        items = []
 
 
-def insert_relay_event(relay_name: str, action: str, source: str = "button") -> None:
+def queue_relay_event(relay_name: str, action: str, source: str = "button") -> None:
     """
-    Inserts a relay ON/OFF event into the 'relay_log' table.
+    Queues a relay ON/OFF event for the background writer thread and returns immediately.
 
     Args:
         relay_name (str): The name of the relay (e.g., "RELAY1").
         action (str): The action performed ("ON" or "OFF").
         source (str, optional): The source of the event. Defaults to "button".
     """
-    ensure_relay_log_table()
-    conn = sqlite3.connect(DB_FILE)
-    cur = conn.cursor()
-    ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    cur.execute(
-        "INSERT INTO relay_log (timestamp, relay_name, action, source) VALUES (?, ?, ?, ?)",
-        (ts, relay_name, action, source),
-    )
-    conn.commit()
-    conn.close()
+    global _relay_thread
+    with _relay_thread_lock:
+        if _relay_thread is None:
+            _relay_thread = threading.Thread(target=_relay_writer_loop, name="relay-log-writer", daemon=True)
+            _relay_thread.start()
+            atexit.register(flush_relay_events, RELAY_EXIT_FLUSH_TIMEOUT)
+    _relay_queue.put(_relay_event_row(relay_name, action, source))
+
+
+def flush_relay_events(timeout: Optional[float] = None) -> bool:
+    """
+    Waits until every queued relay event has been written.
+
+    Args:
+        timeout (Optional[float]): Maximum time to wait, in seconds. None waits indefinitely.
+
+    Returns:
+        bool: True if the queue was fully written, False if the timeout expired first.
+    """
+    with _relay_queue.all_tasks_done:
+        return _relay_queue.all_tasks_done.wait_for(lambda: not _relay_queue.unfinished_tasks, timeout)
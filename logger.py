@@ -1,15 +1,17 @@
 import time
-import datetime
 import os
-import glob
 import argparse
+import signal
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import RPi.GPIO as GPIO
+import Adafruit_DHT
 import logging
-from typing import Optional
+from typing import Optional, Tuple
 
 from relays import init_relays, test_relays, set_relay_state, RELAY1
 from config import LOGS_DIR, DHT_SENSOR, DHT_PIN, STATUS_FILE
-from database import init_db, delete_sql_data, get_sql_data
+from database import init_db, close_db, optimize_db, insert_log_batch, delete_sql_data, get_sql_data
 from sensors import (
     test_dht, test_ads, test_ds18b20, calibrate_ads,
     read_ds18b20_temp, read_soil_raw_shared, read_soil_raw_fresh,
@@ -29,17 +31,60 @@ WATERING_DURATION = 10         # sekundi
 WATERING_COOLDOWN = 3600       # sekundi (1h)
 LAST_WATERING_FILE = "last_watering.txt"
 
+# pauza prije jedinog ponovnog očitanja DHT22
+DHT_RETRY_DELAY = 1.5  # sekundi
+
+# koliko često se brišu stare slike iz LOGS_DIR
+CLEANUP_INTERVAL = 86400  # sekundi (1 dan)
+
+# koliko često se osvježava statistika za planer upita (PRAGMA optimize)
+OPTIMIZE_INTERVAL = 6 * 3600  # sekundi
+
+# broj očitanja koja se upisuju u bazu u jednoj transakciji
+LOG_BATCH_SIZE = 1
+
 def cleanup_old_images(folder: str, months: int = 3) -> None:
     """Removes JPG files older than a specified number of months from a folder."""
     now = time.time()
     cutoff = now - (months * 30 * 24 * 3600)
-    for f in glob.glob(os.path.join(folder, "*.jpg")):
-        try:
-            if os.path.getmtime(f) < cutoff:
-                os.remove(f)
-                logging.info(f"Removed old image: {f}")
-        except OSError as e:
-            logging.error(f"Error removing file {f}: {e}")
+    try:
+        entries = os.scandir(folder)
+    except OSError as e:
+        logging.error(f"Error scanning folder {folder}: {e}")
+        return
+    with entries:
+        for entry in entries:
+            if not entry.name.endswith(".jpg"):
+                continue
+            try:
+                if entry.stat(follow_symlinks=False).st_mtime < cutoff:
+                    os.remove(entry.path)
+                    logging.info(f"Removed old image: {entry.path}")
+            except OSError as e:
+                logging.error(f"Error removing file {entry.path}: {e}")
+
+
+def write_status(content: str, durable: bool = False) -> None:
+    """
+    Atomically replaces STATUS_FILE with the given content.
+
+    Args:
+        content (str): The status text to write.
+        durable (bool): If True, fsyncs before the rename. Only worth it at startup;
+            frequent status updates rely on the atomic rename alone.
+    """
+    tmp = STATUS_FILE + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(content)
+        if durable:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp, STATUS_FILE)
+
+
+def _handle_sigterm(signum, frame) -> None:
+    """Turns SIGTERM (the web UI's Stop) into SystemExit so run_logger's cleanup still runs."""
+    raise SystemExit(0)
 
 
 def should_water(soil_percent: Optional[float]) -> bool:
@@ -74,41 +119,66 @@ def perform_watering() -> None:
     logging.info("Zalijevanje završeno.")
 
 
+def read_i2c_sensors(cold_first: bool = False) -> Tuple[Optional[float], Optional[int], Optional[float]]:
+    """
+    Reads the I2C sensors (BH1750 and ADS1115) one after another.
+
+    Both share the same bus, so they are kept in a single task instead of being read in parallel.
+
+    Args:
+        cold_first (bool): If True, reads the ADS1115 through a freshly created I2C object.
+
+    Returns:
+        Tuple[Optional[float], Optional[int], Optional[float]]: Lux, raw soil value and soil voltage.
+    """
+    lux = read_bh1750_lux()
+    if cold_first:
+        soil_raw, soil_voltage = read_soil_raw_fresh()
+    else:
+        soil_raw, soil_voltage = read_soil_raw_shared()
+    return lux, soil_raw, soil_voltage
+
+
 def run_logger(cold_first: bool = False) -> None:
     """Glavna petlja logiranja senzora."""
-    now = datetime.datetime.now().strftime("%d.%m.%Y. u %H:%M:%S")
+    now = time.strftime("%d.%m.%Y. u %H:%M:%S", time.localtime())
     pid = os.getpid()
 
-    with open(STATUS_FILE, "w") as f:
-        f.write(f"{now} (PID: {pid})")
-        f.flush()
-        os.fsync(f.fileno())
+    write_status(f"{now} (PID: {pid})", durable=True)
+    # without a handler SIGTERM kills the process before pending rows are flushed
+    signal.signal(signal.SIGTERM, _handle_sigterm)
 
     init_relays()
     conn = init_db()
-    c = conn.cursor()
+    pending = deque()
+    last_cleanup = 0.0
+    last_optimize = time.time()
     os.makedirs(LOGS_DIR, exist_ok=True)
+    pool = ThreadPoolExecutor(max_workers=2)
 
     try:
         while True:
-            timestamp = datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+            now_ts = time.time()
+            timestamp = time.strftime("%Y-%m-%d_%H-%M-%S", time.localtime(now_ts))
 
-            lux = read_bh1750_lux()
-
-            if cold_first:
-                soil_raw, soil_voltage = read_soil_raw_fresh()
-            else:
-                soil_raw, soil_voltage = read_soil_raw_shared()
-            soil_percent = read_soil_percent_from_voltage(soil_voltage)
+            # DS18B20 (1-Wire, ~750 ms konverzija) i I2C senzori čitaju se u pozadini
+            # dok se DHT22 očitava u glavnoj niti.
+            ds18b20_future = pool.submit(read_ds18b20_temp)
+            i2c_future = pool.submit(read_i2c_sensors, cold_first)
 
             humidity, temperature = None, None
             try:
-                import Adafruit_DHT
-                humidity, temperature = Adafruit_DHT.read_retry(DHT_SENSOR, DHT_PIN)
+                # jedan ponovni pokušaj umjesto read_retry (do 15 pokušaja, ~30 s blokiranja)
+                humidity, temperature = Adafruit_DHT.read(DHT_SENSOR, DHT_PIN)
+                if humidity is None or temperature is None:
+                    time.sleep(DHT_RETRY_DELAY)
+                    humidity, temperature = Adafruit_DHT.read(DHT_SENSOR, DHT_PIN)
             except Exception as e:
                 logging.error(f"DHT22 Greška: {e}")
 
-            temp_ds18b20 = read_ds18b20_temp()
+            temp_ds18b20 = ds18b20_future.result()
+            lux, soil_raw, soil_voltage = i2c_future.result()
+            soil_percent = read_soil_percent_from_voltage(soil_voltage)
 
             humidity = round(humidity, 3) if humidity is not None else None
             temperature = round(temperature, 3) if temperature is not None else None
@@ -118,12 +188,7 @@ def run_logger(cold_first: bool = False) -> None:
 
             stable_flag = 1
 
-            c.execute("""
-                INSERT INTO logs (timestamp, dht22_air_temp, dht22_humidity,
-                                  ds18b20_soil_temp, soil_raw, soil_voltage,
-                                  soil_percent, lux, stable)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
+            pending.append((
                 timestamp,
                 temperature,
                 humidity,
@@ -132,9 +197,12 @@ def run_logger(cold_first: bool = False) -> None:
                 soil_voltage,
                 soil_percent,
                 lux,
-                stable_flag
+                stable_flag,
+                int(now_ts)
             ))
-            conn.commit()
+            if len(pending) >= LOG_BATCH_SIZE:
+                insert_log_batch(conn, pending)
+                pending.clear()
 
             mode_tag = "COLD" if cold_first else "SHARED"
             logging.info(
@@ -144,14 +212,22 @@ def run_logger(cold_first: bool = False) -> None:
                 f"Lux:{lux}, STABLE={stable_flag}"
             )
 
-            cleanup_old_images(LOGS_DIR, months=3)
+            if time.time() - last_cleanup > CLEANUP_INTERVAL:
+                cleanup_old_images(LOGS_DIR, months=3)
+                last_cleanup = time.time()
+            if time.time() - last_optimize > OPTIMIZE_INTERVAL:
+                optimize_db(conn)
+                last_optimize = time.time()
             time.sleep(2400)
 
-    except KeyboardInterrupt:
+    except (KeyboardInterrupt, SystemExit):
         logging.info("Zaustavljeno od strane korisnika.")
     finally:
+        pool.shutdown(wait=True)
         GPIO.cleanup()
-        conn.close()
+        if pending:
+            insert_log_batch(conn, pending)
+        close_db(conn)
         if os.path.exists(STATUS_FILE):
             os.remove(STATUS_FILE)
 
@@ -1,8 +1,9 @@
 import os
 import json
 import time
+import threading
 import datetime
-from typing import Tuple, Optional, Dict
+from typing import Any, Tuple, Optional, Dict
 
 import smbus2
 from adafruit_ads1x15.analog_in import AnalogIn
@@ -10,6 +11,31 @@ import adafruit_ads1x15.ads1115 as ADS
 
 from config import CALIB_FILE, device_file, DHT_SENSOR, DHT_PIN, i2c as shared_i2c
 
+# At 860 SPS one conversion takes ~1.2 ms, so the settle pause can be much shorter than before.
+ADS_DATA_RATE = 860
+ADS_SETTLE_TIME = 1.2 / ADS_DATA_RATE
+
+# ADS1115 on the shared I2C bus, configured once on first use.
+_ADS: Optional[ADS.ADS1115] = None
+_CHAN: Optional[AnalogIn] = None
+
+
+def _setup_ads(i2c_bus) -> ADS.ADS1115:
+    """
+    Creates an ADS1115 object with the gain and data rate used for soil readings.
+
+    Args:
+        i2c_bus: The I2C bus the ADC is connected to.
+
+    Returns:
+        ADS.ADS1115: The configured ADS1115 object.
+    """
+    ads = ADS.ADS1115(i2c_bus)
+    ads.gain = 1
+    ads.data_rate = ADS_DATA_RATE
+    return ads
+
+
 def read_soil_raw_shared() -> Tuple[Optional[int], Optional[float]]:
     """
     Reads the raw soil moisture value and voltage from the ADS1115 sensor using the shared I2C bus.
@@ -17,11 +43,13 @@ def read_soil_raw_shared() -> Tuple[Optional[int], Optional[float]]:
     Returns:
         Tuple[Optional[int], Optional[float]]: Raw ADC value and voltage, or (None, None) on failure.
     """
+    global _ADS, _CHAN
     if not shared_i2c:
         return None, None
-    ads = ADS.ADS1115(shared_i2c)
-    ads.gain = 1
-    return _read_ads_once(ads)
+    if _ADS is None:
+        _ADS = _setup_ads(shared_i2c)
+        _CHAN = AnalogIn(_ADS, ADS.P0)
+    return _read_ads_once(_CHAN)
 
 
 def read_soil_raw_fresh() -> Tuple[Optional[int], Optional[float]]:
@@ -35,9 +63,8 @@ def read_soil_raw_fresh() -> Tuple[Optional[int], Optional[float]]:
         import board
         import busio
         i2c = busio.I2C(board.SCL, board.SDA)
-        ads = ADS.ADS1115(i2c)
-        ads.gain = 1
-        raw, voltage = _read_ads_once(ads)
+        ads = _setup_ads(i2c)
+        raw, voltage = _read_ads_once(AnalogIn(ads, ADS.P0))
         del ads
         del i2c
         return raw, voltage
@@ -56,29 +83,59 @@ def read_ds18b20_temp() -> Optional[float]:
     if not device_file:
         return None
     try:
-        with open(device_file, 'r') as f:
-            lines = f.readlines()
-        if lines[0].strip()[-3:] != 'YES':
+        with open(device_file, 'rb') as f:
+            data = f.read()
+        eol = data.find(b'\n')
+        if not data[:eol].rstrip().endswith(b'YES'):
             return None
-        equals_pos = lines[1].find('t=')
+        equals_pos = data.find(b't=', eol)
         if equals_pos != -1:
-            temp_string = lines[1][equals_pos + 2:]
-            return float(temp_string) / 1000.0
+            return int(data[equals_pos + 2:].strip()) / 1000.0
     except Exception:
         return None
     return None
 
 
+# Parsed calibration, reused until CALIB_FILE's mtime changes.
+_CALIB_CACHE: Dict[str, Any] = {"mtime": None, "data": None}
+
+
+def invalidate_calibration() -> None:
+    """Drops the cached calibration so the next load re-reads CALIB_FILE."""
+    _CALIB_CACHE["mtime"] = None
+    _CALIB_CACHE["data"] = None
+
+
 def load_calibration() -> Dict[str, float]:
     """
-    Loads voltage calibration data from the JSON file.
+    Loads voltage calibration data, re-reading the JSON file only when it has changed.
+
+    Returns:
+        Dict[str, float]: A dictionary with 'dry_v' and 'wet_v' keys.
+    """
+    try:
+        mtime = os.stat(CALIB_FILE).st_mtime
+    except OSError:
+        mtime = None
+    if _CALIB_CACHE["data"] is None or _CALIB_CACHE["mtime"] != mtime:
+        _CALIB_CACHE["data"] = _read_calibration_file(exists=mtime is not None)
+        _CALIB_CACHE["mtime"] = mtime
+    return dict(_CALIB_CACHE["data"])
+
+
+def _read_calibration_file(exists: bool) -> Dict[str, float]:
+    """
+    Reads voltage calibration data from the JSON file.
+
+    Args:
+        exists (bool): Whether CALIB_FILE is present on disk.
 
     Returns:
         Dict[str, float]: A dictionary with 'dry_v' and 'wet_v' keys.
     """
     defDryV = 1.60
     defWetV = 0.20
-    if not os.path.exists(CALIB_FILE):
+    if not exists:
         print("[WARN] Calibration file not found -> using defaults")
         return {"dry_v": defDryV, "wet_v": defWetV}
 
@@ -95,19 +152,18 @@ def load_calibration() -> Dict[str, float]:
         return {"dry_v": defDryV, "wet_v": defWetV}
 
 
-def _read_ads_once(ads: ADS.ADS1115) -> Tuple[int, float]:
+def _read_ads_once(chan: AnalogIn) -> Tuple[int, float]:
     """
     Performs a stable read from the ADS1115 ADC.
 
     Args:
-        ads (ADS.ADS1115): The ADS1115 object.
+        chan (AnalogIn): The ADS1115 input channel to read.
 
     Returns:
         Tuple[int, float]: The raw ADC value and the corresponding voltage.
     """
-    chan = AnalogIn(ads, ADS.P0)
     _ = chan.value
-    time.sleep(0.05)
+    time.sleep(ADS_SETTLE_TIME)
     raw = chan.value
     voltage = chan.voltage
     return raw, voltage
@@ -121,9 +177,8 @@ def read_soil_raw() -> Tuple[Optional[int], Optional[float]]:
         import board
         import busio
         i2c = busio.I2C(board.SCL, board.SDA)
-        ads = ADS.ADS1115(i2c)
-        ads.gain = 1
-        raw, voltage = _read_ads_once(ads)
+        ads = _setup_ads(i2c)
+        raw, voltage = _read_ads_once(AnalogIn(ads, ADS.P0))
         return raw, voltage
     except Exception as e:
         print(f"[WARN] fresh ADS read error: {e}")
@@ -182,26 +237,48 @@ def read_soil_percent(raw: Optional[int] = None, voltage: Optional[float] = None
 
 
 BH1750_ADDR = 0x23
-BH1750_MODE = 0x10
+BH1750_MODE = 0x10  # continuous high-resolution mode
+
+# Bus kept open between reads; the logger and the web UI may read concurrently.
+_BH1750_BUS: Optional[smbus2.SMBus] = None
+_BH1750_LOCK = threading.Lock()
 
 
 def read_bh1750_lux() -> Optional[float]:
     """
     Reads the ambient light intensity in Lux from the BH1750 sensor.
 
+    The sensor is put into continuous mode once, after which each call only
+    fetches the latest measurement.
+
     Returns:
         Optional[float]: The light intensity in Lux, or None on failure.
     """
-    try:
-        bus = smbus2.SMBus(1)
-        bus.write_byte(BH1750_ADDR, BH1750_MODE)
-        time.sleep(0.2)
-        data = bus.read_i2c_block_data(BH1750_ADDR, BH1750_MODE, 2)
-        lux = (data[0] << 8 | data[1]) / 1.2
-        return round(lux, 2)
-    except Exception as e:
-        print(f"[WARN] BH1750 očitanje nije uspjelo: {e}")
-        return None
+    global _BH1750_BUS
+    with _BH1750_LOCK:
+        try:
+            if _BH1750_BUS is None:
+                bus = smbus2.SMBus(1)
+                try:
+                    bus.write_byte(BH1750_ADDR, BH1750_MODE)
+                    time.sleep(0.2)
+                except BaseException:
+                    bus.close()
+                    raise
+                _BH1750_BUS = bus
+            # plain 2-byte read: an SMBus block read would first re-send the
+            # mode byte and restart the 120 ms measurement
+            msg = smbus2.i2c_msg.read(BH1750_ADDR, 2)
+            _BH1750_BUS.i2c_rdwr(msg)
+            data = list(msg)
+            lux = (data[0] << 8 | data[1]) / 1.2
+            return round(lux, 2)
+        except Exception as e:
+            print(f"[WARN] BH1750 očitanje nije uspjelo: {e}")
+            if _BH1750_BUS is not None:
+                _BH1750_BUS.close()
+                _BH1750_BUS = None
+            return None
 
 
 def test_dht() -> Tuple[Optional[float], Optional[float]]:
@@ -256,4 +333,5 @@ def calibrate_ads(dry: bool = False, wet: bool = False) -> None:
         print(f"Snima se WET referenca (V): {voltage:.3f} V  [raw={raw}]")
     with open(CALIB_FILE, "w") as f:
         json.dump(calib, f)
+    invalidate_calibration()
     print("Kalibracija spremljena:", calib)
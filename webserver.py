@@ -1,30 +1,126 @@
+import functools
+import html
 import os
-import sqlite3
+import select
 import subprocess
 import threading
 import time
+import traceback
+from contextlib import ExitStack
 from typing import List, Dict, Any, Tuple, Optional
-import datetime
 import sys
 
 import relays
 import config
-from flask import Flask, render_template, jsonify, request
+import database
+from flask import Flask, Response, render_template, jsonify, request, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 
-from config import BASE_DIR, DB_FILE, RELAY1, RELAY2
+from config import BASE_DIR, RELAY1, RELAY2
+from database import parse_id_ranges, reader, writer
 from relays import get_relay_state
 import sensors
 from sensors import read_bh1750_lux
 
+# orjson is optional; without it Flask's default JSON provider is used.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 app = Flask(__name__, template_folder=os.path.join(BASE_DIR, "templates"))
 
+
+if orjson is not None:
+    class OrjsonProvider(DefaultJSONProvider):
+        """Flask JSON provider backed by orjson."""
+
+        def dumps(self, obj: Any, **kwargs: Any) -> str:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+        def loads(self, s: Any, **kwargs: Any) -> Any:
+            return orjson.loads(s)
+
+    app.json = OrjsonProvider(app)
+
+# SQL kept as module constants so each query hits the sqlite3 statement cache.
+SQL_LAST_LOGS = "SELECT id, timestamp, dht22_air_temp, dht22_humidity, ds18b20_soil_temp, soil_raw, soil_voltage, soil_percent, lux, stable FROM logs ORDER BY id DESC LIMIT ?"
+SQL_API_LOGS = """
+    SELECT id, timestamp,
+           dht22_air_temp AS air_temp,
+           dht22_humidity AS air_humidity,
+           ds18b20_soil_temp AS soil_temp,
+           soil_percent,
+           lux,
+           stable
+    FROM logs
+    ORDER BY id DESC
+    LIMIT ?
+"""
+SQL_API_LOGS_WINDOW = "SELECT MAX(id), MIN(id), COUNT(*), MAX(ts_unix), MIN(ts_unix) FROM (SELECT id, ts_unix FROM logs ORDER BY id DESC LIMIT ?)"
+LAST_LOGS_COLS = ("id", "timestamp", "air_temp", "air_humidity", "soil_temp",
+                  "soil_raw", "soil_voltage", "soil_percent", "lux", "stable")
+API_LOGS_COLS = ("id", "timestamp", "air_temp", "air_humidity", "soil_temp",
+                 "soil_percent", "lux", "stable")
+SQL_LOGS_ALL_BASE = "SELECT id, timestamp, dht22_air_temp AS air_temp, dht22_humidity AS air_humidity, ds18b20_soil_temp AS soil_temp, soil_percent, lux, stable FROM logs"
+SQL_RELAY_LOG = "SELECT timestamp, relay_name, action FROM relay_log ORDER BY timestamp DESC LIMIT 10"
+
+# Filters accepted by /api/logs/all (?col=..&op=..&val=..), mapped to SQL.
+LOGS_FILTER_COLUMNS = {
+    "id": "id",
+    "timestamp": "timestamp",
+    "ts_unix": "ts_unix",
+    "air_temp": "dht22_air_temp",
+    "air_humidity": "dht22_humidity",
+    "soil_temp": "ds18b20_soil_temp",
+    "soil_percent": "soil_percent",
+    "lux": "lux",
+    "stable": "stable",
+}
+LOGS_FILTER_OPS = {
+    "eq": "= ?",
+    "gt": "> ?",
+    "ge": ">= ?",
+    "lt": "< ?",
+    "le": "<= ?",
+    "between": "BETWEEN ? AND ?",
+}
+LOGS_FILTER_MAX = 8  # filters per request
+LOGS_ALL_SQL_CACHE_SIZE = 64  # distinct filter shapes kept compiled
+
+# Rows fetched and encoded per chunk of a streamed JSON response.
+STREAM_BATCH_SIZE = 512
+
+# How much of the end of logger_logfile /logs/file shows.
+LOGFILE_TAIL_BYTES = 20000
+
+# Largest IN (...) list per DELETE; shorter lists are padded to a power of two
+# so only a handful of distinct statements ever get compiled.
+DELETE_CHUNK_SIZE = 512
+
+# Relay GPIO pins from config (RELAY1, RELAY2, ...), by name and by number.
+_RELAY_PINS: Dict[str, int] = {
+    name: getattr(config, name) for name in dir(config)
+    if name.startswith("RELAY") and name[5:].isdigit()
+}
+_RELAY_PINS_BY_NUM: Dict[int, int] = {int(name[5:]): pin for name, pin in _RELAY_PINS.items()}
+
+# How long /relay_log_data waits for queued relay events to be written.
+RELAY_FLUSH_TIMEOUT = 0.5  # seconds
+
 logger_lock = threading.Lock()
 logger_process: Optional[subprocess.Popen] = None
 logger_logfile = os.path.join(BASE_DIR, "logger_run.log")
 
 
-def is_logger_running() -> bool:
-    """Checks if the logger subprocess is currently running."""
+# Short-lived caches for the endpoints the dashboard polls.
+RUNNING_CACHE_TTL = 0.2  # seconds
+_running_cache: Dict[str, Any] = {"ts": None, "value": False}
+_status_cache: Dict[str, Any] = {"mtime": None, "content": None}
+
+
+def _poll_logger() -> bool:
+    """Checks, without caching, if the logger subprocess is currently running."""
     global logger_process
     if logger_process is None:
         return False
@@ -34,6 +130,75 @@ def is_logger_running() -> bool:
     return False
 
 
+def is_logger_running() -> bool:
+    """Checks if the logger subprocess is currently running, reusing results younger than RUNNING_CACHE_TTL."""
+    now = time.monotonic()
+    ts = _running_cache["ts"]
+    if ts is None or now - ts >= RUNNING_CACHE_TTL:
+        _running_cache["value"] = _poll_logger()
+        _running_cache["ts"] = now
+    return _running_cache["value"]
+
+
+def _invalidate_logger_caches() -> None:
+    """Forgets cached logger state after the logger was started or stopped."""
+    _running_cache["ts"] = None
+    _status_cache["mtime"] = None
+    _status_cache["content"] = None
+
+
+def read_status_file() -> Optional[str]:
+    """
+    Returns the stripped content of STATUS_FILE, re-reading it only when its mtime changes.
+
+    Returns:
+        Optional[str]: The status text, or None if the file does not exist.
+    """
+    try:
+        mtime = os.stat(config.STATUS_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if _status_cache["content"] is None or _status_cache["mtime"] != mtime:
+        with open(config.STATUS_FILE, "r") as f:
+            _status_cache["content"] = f.read().strip()
+        _status_cache["mtime"] = mtime
+    return _status_cache["content"]
+
+
+def wait_proc(proc: subprocess.Popen, timeout: float) -> bool:
+    """
+    Waits up to `timeout` seconds for a subprocess to exit.
+
+    On Linux 5.3+ this blocks on a pidfd, so it returns as soon as the process
+    exits; elsewhere it falls back to Popen.wait().
+
+    Args:
+        proc (subprocess.Popen): The process to wait for.
+        timeout (float): Maximum time to wait, in seconds.
+
+    Returns:
+        bool: True if the process has exited, False if it is still running.
+    """
+    if proc.poll() is not None:
+        return True
+    if hasattr(os, "pidfd_open"):
+        try:
+            fd = os.pidfd_open(proc.pid)
+        except OSError:
+            fd = None
+        if fd is not None:
+            try:
+                select.select([fd], [], [], timeout)
+            finally:
+                os.close(fd)
+            return proc.poll() is not None
+    try:
+        proc.wait(timeout)
+        return True
+    except subprocess.TimeoutExpired:
+        return False
+
+
 def start_logger(mode: str = "run") -> Tuple[bool, str]:
     """
     Starts the logger.py script as a subprocess.
@@ -46,17 +211,22 @@ def start_logger(mode: str = "run") -> Tuple[bool, str]:
     """
     global logger_process
     with logger_lock:
-        if is_logger_running():
+        if _poll_logger():
             return False, "already_running"
         logger_py = os.path.join(BASE_DIR, "logger.py")
         if not os.path.isfile(logger_py):
             return False, f"logger.py not found at {logger_py}"
         cmd = [sys.executable, logger_py, mode]
-        logfile = open(logger_logfile, "a")
-        proc = subprocess.Popen(cmd, cwd=BASE_DIR, stdout=logfile, stderr=logfile)
+        # Popen already spawns via vfork()/posix_spawn on Linux (CPython 3.10+), so the
+        # Flask process's memory is never copied. The child keeps its own copy of the
+        # log descriptor, so the parent's is closed right away instead of leaking.
+        with open(logger_logfile, "a") as logfile:
+            proc = subprocess.Popen(cmd, cwd=BASE_DIR, stdin=subprocess.DEVNULL,
+                                    stdout=logfile, stderr=logfile)
         logger_process = proc
-        time.sleep(0.2)
-        if proc.poll() is None:
+        started = not wait_proc(proc, 0.2)
+        _invalidate_logger_caches()
+        if started:
             return True, f"started pid={proc.pid}"
         else:
             return False, "failed_to_start"
@@ -66,51 +236,59 @@ def stop_logger() -> Tuple[bool, str]:
     """Stops the logger subprocess."""
     global logger_process
     with logger_lock:
-        if not is_logger_running():
+        if not _poll_logger():
             try:
                 with open(config.STATUS_FILE, "w") as f:
                     f.write("STOPPED\n")
             except Exception as e:
                 print(f"[WARN] Ne mogu pisati u STATUS_FILE: {e}")
+            _invalidate_logger_caches()
             return False, "not_running"
 
         try:
             logger_process.terminate()
-            for _ in range(10):
-                if logger_process.poll() is not None:
-                    break
-                time.sleep(0.2)
-            if logger_process.poll() is None:
+            if not wait_proc(logger_process, 2.0):
                 logger_process.kill()
+                wait_proc(logger_process, 1.0)
 
             pid = logger_process.pid
             logger_process = None
-            time.sleep(0.1)
             with open(config.STATUS_FILE, "w") as f:
                 f.write("-.-")
+            _invalidate_logger_caches()
             return True, f"stopped pid={pid}"
         except Exception as e:
             print(f"[ERROR] stop_logger(): {e}")
+            _invalidate_logger_caches()
             return False, f"error:{e}"
 
 
+def _bucket_size(n: int) -> int:
+    """Rounds n up to the next power of two (at most DELETE_CHUNK_SIZE)."""
+    size = 1
+    while size < n:
+        size *= 2
+    return min(size, DELETE_CHUNK_SIZE)
+
+
+def _delete_ids_sql(n: int) -> str:
+    """Returns the DELETE statement for a chunk of n IDs, shared by every chunk in the same bucket."""
+    return "DELETE FROM logs WHERE id IN (" + ",".join("?" * _bucket_size(n)) + ")"
+
+
+def _pad_ids(ids: List[int]) -> List[int]:
+    """Pads an ID chunk to its bucket size by repeating the last ID."""
+    return ids + [ids[-1]] * (_bucket_size(len(ids)) - len(ids))
+
+
 def get_last_logs(limit: int = 100) -> List[Dict[str, Any]]:
     """Retrieves the last N log entries from the database."""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        c.execute("SELECT id, timestamp, dht22_air_temp, dht22_humidity, ds18b20_soil_temp, soil_raw, soil_voltage, soil_percent, lux, stable FROM logs ORDER BY id DESC LIMIT ?", (limit,))
-        rows = c.fetchall()
-        rows.reverse()
-        result = []
-        for r in rows:
-            result.append({
-                "id": r[0], "timestamp": r[1], "air_temp": r[2], "air_humidity": r[3],
-                "soil_temp": r[4], "soil_raw": r[5], "soil_voltage": r[6],
-                "soil_percent": r[7], "lux": r[8], "stable": r[9]
-            })
-        conn.close()
-        return result
+        with reader() as conn:
+            c = conn.cursor()
+            c.execute(SQL_LAST_LOGS, (limit,))
+            rows = c.fetchall()
+        return [dict(zip(LAST_LOGS_COLS, r)) for r in reversed(rows)]
     except Exception:
         return []
 
@@ -146,44 +324,89 @@ def api_run_status():
 @app.route("/api/logs", methods=["GET"])
 def api_logs():
     limit = int(request.args.get("limit", 100))
-    conn = sqlite3.connect(DB_FILE)
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
-    c.execute("""
-        SELECT id, timestamp,
-               dht22_air_temp AS air_temp,
-               dht22_humidity AS air_humidity,
-               ds18b20_soil_temp AS soil_temp,
-               soil_percent,
-               lux,
-               stable
-        FROM logs
-        ORDER BY id DESC
-        LIMIT ?
-    """, (limit,))
-    rows = [dict(r) for r in c.fetchall()]
-    rows.reverse()
-    conn.close()
-    return jsonify(rows)
+    with reader() as conn:
+        # Log rows are never updated in place, but IDs are reused after
+        # `logger.py delete_sql_data --all` resets the sequence, so the tag combines
+        # the id window with the reading times at both ends of it.
+        max_id, min_id, count, max_ts, min_ts = conn.execute(SQL_API_LOGS_WINDOW, (limit,)).fetchone()
+        etag = f"{limit}-{max_id}-{min_id}-{count}-{max_ts}-{min_ts}"
+        if request.if_none_match.contains(etag):
+            resp = Response(status=304)
+        else:
+            rows = conn.execute(SQL_API_LOGS, (limit,)).fetchall()
+            resp = jsonify([dict(zip(API_LOGS_COLS, r)) for r in reversed(rows)])
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+
+@functools.lru_cache(maxsize=LOGS_ALL_SQL_CACHE_SIZE)
+def _logs_all_sql(shape: Tuple[Tuple[str, str], ...]) -> str:
+    """
+    Returns the /api/logs/all query for a given sequence of (column, op) filters.
+
+    Queries are cached per shape, so requests that filter the same way reuse
+    the same SQL text and with it the compiled statement.
+    """
+    clauses = [f"{LOGS_FILTER_COLUMNS[col]} {LOGS_FILTER_OPS[op]}" for col, op in shape]
+    sql = SQL_LOGS_ALL_BASE
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    return sql + " ORDER BY id ASC"
 
 
 @app.route("/api/logs/all")
 def api_logs_all():
-    where = request.args.get("where", "")
-    conn = sqlite3.connect(DB_FILE)
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
-    query = "SELECT id, timestamp, dht22_air_temp AS air_temp, dht22_humidity AS air_humidity, ds18b20_soil_temp AS soil_temp, soil_percent, lux, stable FROM logs"
-    if where:
-        query += f" WHERE {where}"
-    query += " ORDER BY id ASC"
+    if "where" in request.args:
+        return jsonify({"ok": False, "error": "'where' is no longer supported; use col/op/val"}), 400
+    cols = request.args.getlist("col")
+    ops = request.args.getlist("op")
+    vals = request.args.getlist("val")
+    if not len(cols) == len(ops) == len(vals):
+        return jsonify({"ok": False, "error": "col, op and val must be given the same number of times"}), 400
+    if len(cols) > LOGS_FILTER_MAX:
+        return jsonify({"ok": False, "error": f"at most {LOGS_FILTER_MAX} filters are allowed"}), 400
+    params: List[str] = []
+    for col, op, val in zip(cols, ops, vals):
+        if col not in LOGS_FILTER_COLUMNS:
+            return jsonify({"ok": False, "error": f"unknown column: {col}"}), 400
+        if op not in LOGS_FILTER_OPS:
+            return jsonify({"ok": False, "error": f"unknown op: {op}"}), 400
+        if op == "between":
+            bounds = val.split(",")
+            if len(bounds) != 2:
+                return jsonify({"ok": False, "error": "between expects val=<low>,<high>"}), 400
+            params.extend(bounds)
+        else:
+            params.append(val)
+    query = _logs_all_sql(tuple(zip(cols, ops)))
+
+    # The reader stays checked out until the streamed response has been sent.
+    stack = ExitStack()
     try:
-        c.execute(query)
-        rows = [dict(r) for r in c.fetchall()]
+        conn = stack.enter_context(reader())
+        cur = conn.execute(query, params)
     except Exception as e:
+        stack.close()
         return jsonify({"ok": False, "error": str(e)}), 400
-    conn.close()
-    return jsonify(rows)
+
+    def generate():
+        try:
+            yield "["
+            sep = ""
+            while True:
+                batch = cur.fetchmany(STREAM_BATCH_SIZE)
+                if not batch:
+                    break
+                # encode the whole batch as one array and drop its brackets
+                yield sep + app.json.dumps([dict(zip(API_LOGS_COLS, r)) for r in batch])[1:-1]
+                sep = ","
+            yield "]"
+        finally:
+            cur.close()
+            stack.close()
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
 
 
 @app.route("/all_data")
@@ -221,14 +444,14 @@ def api_relay_toggle():
         relay_num = int(data.get("relay"))
         state = bool(data.get("state"))
         relay_name = f"RELAY{relay_num}"
-        relay_pin = getattr(config, relay_name)
+        relay_pin = _RELAY_PINS_BY_NUM.get(relay_num)
+        if relay_pin is None:
+            return jsonify({"ok": False, "error": f"unknown relay: {relay_num}"}), 400
         relays.set_relay_state(relay_pin, state)
-        import database
-        database.insert_relay_event(relay_name, "ON" if state else "OFF", source="button")
+        database.queue_relay_event(relay_name, "ON" if state else "OFF", source="button")
         print(f"[LOG] {relay_name} -> {'ON' if state else 'OFF'} (ručno putem web sučelja)")
         return jsonify({"ok": True, "relay": relay_name, "state": "ON" if state else "OFF"})
     except Exception as e:
-        import traceback
         traceback.print_exc()
         return jsonify({"ok": False, "error": str(e)}), 500
 
@@ -236,8 +459,11 @@ def api_relay_toggle():
 @app.route("/logs/file")
 def get_logfile():
     if os.path.isfile(logger_logfile):
-        with open(logger_logfile, "r") as f:
-            return "<pre>" + f.read()[-20000:] + "</pre>"
+        with open(logger_logfile, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - LOGFILE_TAIL_BYTES))
+            tail = f.read().decode("utf-8", "replace")
+        return "<pre>" + html.escape(tail) + "</pre>"
     return "No logfile found."
 
 
@@ -246,29 +472,24 @@ def api_logs_delete():
     data = request.json
     ids = data.get("ids", "")
     try:
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
         if isinstance(ids, str) and ids.strip().lower() == "all":
-            c.execute("DELETE FROM logs")
-            conn.commit()
+            with writer() as conn:
+                conn.execute("DELETE FROM logs")
             deleted = "all"
         else:
-            id_list = []
-            for part in ids.split(','):
-                part = part.strip()
-                if '-' in part:
-                    start, end = part.split('-')
-                    id_list.extend(range(int(start), int(end) + 1))
-                else:
-                    id_list.append(int(part))
-
-            if not id_list:
+            if not ids.strip():
                 return jsonify({"ok": False, "msg": "Nema ID-eva za brisanje"}), 400
-            placeholders = ",".join("?" for _ in id_list)
-            c.execute(f"DELETE FROM logs WHERE id IN ({placeholders})", id_list)
-            conn.commit()
-            deleted = len(id_list)
-        conn.close()
+            ranges = parse_id_ranges(ids)
+            # Ranges become one BETWEEN each; single IDs share bucketed IN lists.
+            spans = [(a, b) for a, b in ranges if a != b]
+            singles = [a for a, b in ranges if a == b]
+            deleted = 0
+            with writer() as conn:
+                if spans:
+                    deleted += conn.executemany("DELETE FROM logs WHERE id BETWEEN ? AND ?", spans).rowcount
+                for i in range(0, len(singles), DELETE_CHUNK_SIZE):
+                    chunk = singles[i:i + DELETE_CHUNK_SIZE]
+                    deleted += conn.execute(_delete_ids_sql(len(chunk)), _pad_ids(chunk)).rowcount
         return jsonify({"ok": True, "deleted": deleted})
     except Exception as e:
         return jsonify({"ok": False, "error": str(e)}), 500
@@ -277,11 +498,12 @@ def api_logs_delete():
 @app.route("/toggle_relay/<relay_id>", methods=["POST"])
 def toggle_relay(relay_id: str):
     state = request.form.get("state")
-    relay_pin = getattr(config, relay_id)
+    relay_pin = _RELAY_PINS.get(relay_id)
+    if relay_pin is None:
+        return jsonify({"ok": False, "error": f"unknown relay: {relay_id}"}), 400
     relays.set_relay_state(relay_pin, state == "ON")
     try:
-        import database
-        database.insert_relay_event(relay_id, state, source="button")
+        database.queue_relay_event(relay_id, state, source="button")
         print(f"[LOG] Relej {relay_id} -> {state}")
     except Exception as e:
         print(f"[WARN] Relay log upis nije uspio: {e}")
@@ -290,17 +512,21 @@ def toggle_relay(relay_id: str):
 
 @app.route("/relay_log_data")
 def relay_log_data():
-    conn = sqlite3.connect(DB_FILE)
-    cur = conn.cursor()
-    cur.execute("SELECT timestamp, relay_name, action FROM relay_log ORDER BY timestamp DESC LIMIT 10")
-    rows = cur.fetchall()
-    conn.close()
+    # include toggles that are still queued, but never hold the request for long
+    database.flush_relay_events(timeout=RELAY_FLUSH_TIMEOUT)
+    with reader() as conn:
+        cur = conn.cursor()
+        cur.execute(SQL_RELAY_LOG)
+        rows = cur.fetchall()
     data = []
     for ts, relay, action in rows:
         try:
-            t = datetime.datetime.strptime(ts, "%Y-%m-%d %H:%M:%S").strftime("%d.%m.%Y %H:%M:%S")
-            value = 1 if action.upper() == "ON" else 0
-            data.append({"t": t, "relay": relay.upper(), "v": value, "action": action.upper()})
+            # timestamp is always "YYYY-MM-DD HH:MM:SS"; rearrange it to "DD.MM.YYYY HH:MM:SS"
+            if len(ts) != 19:
+                raise ValueError(f"unexpected timestamp {ts!r}")
+            t = f"{ts[8:10]}.{ts[5:7]}.{ts[0:4]} {ts[11:19]}"
+            a = action.upper()
+            data.append({"t": t, "relay": relay.upper(), "v": 1 if a == "ON" else 0, "action": a})
         except Exception as e:
             print(f"[WARN] relay_log_data parse error: {e}")
     return jsonify(data)
@@ -308,12 +534,17 @@ def relay_log_data():
 
 @app.route("/api/status")
 def api_status():
-    if os.path.exists(config.STATUS_FILE):
-        with open(config.STATUS_FILE, "r") as f:
-            content = f.read().strip()
+    content = read_status_file()
+    if content is not None:
         return {"status": content}
     else:
         return {"status": "Logger nije pokrenut"}
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000)
+    try:
+        from waitress import serve
+    except ImportError:
+        print("[WARN] waitress nije instaliran, koristim Flask razvojni server.")
+        app.run(host="0.0.0.0", port=5000)
+    else:
+        serve(app, host="0.0.0.0", port=5000, threads=config.WEB_THREADS, connection_limit=64, channel_timeout=30)